@@ -8,25 +8,164 @@ Use AWS Lambda to extract books from a user's Goodreads shelf.
 # We can remove this once migrating away from grequests
 import bibliophile  # isort: skip, pylint: disable=unused-import
 
-import json
+import logging
+import operator
 import os
 import time
 import typing
+from collections import OrderedDict
 from datetime import timedelta
-from typing import Any, Dict, List, Optional, Type, TypeVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
 
 import boto3
+import orjson
 from aws_lambda_context import LambdaContext
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 from bibliophile import goodreads
 from bibliophile.goodreads.types import Book
 
+logger = logging.getLogger(__name__)
+
 JsonDict = Dict[str, Any]
 
+# Headers for each kind of response, defined in one place.
+# Responses get a copy, so a caller modifying one can't affect later invocations.
+_ERROR_HEADERS: JsonDict = {'Content-Type': 'application/json'}
+_SUCCESS_HEADERS: JsonDict = {
+    'Content-Type': 'application/json',
+    # In order to call `api.dcain.me/<RouteName>` from origins other than
+    # `api.dcain.me`, we must enable CORS.
+    #
+    # To enable CORS fully, the first step is to "Enable CORS" from within the
+    # API Gateway console (or, preferably, by using `cors:true` in
+    # `serverless.yml` for each function). This will automatically configure the
+    # `OPTIONS` route with the appropriate CORS headers.
+    #
+    # The next step is to manually return CORS headers from the POST route.
+    # (which is what the below headers do)
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': True,
+}
+
 
 # The Goodreads API terms request that we not cache information longer than 24 hours
 GOODREADS_CACHE_DURATION = int(timedelta(hours=24).total_seconds())
 
+# Warm containers may serve the same user several times in quick succession.
+# Remember recent cache hits in memory for a short while, sparing a trip to DynamoDB.
+IN_PROCESS_CACHE_DURATION = int(timedelta(minutes=1).total_seconds())
+# Containers may serve many users, so only remember the most recently used shelves.
+IN_PROCESS_CACHE_SIZE = 128
+
+SHELF_TABLE_NAME = 'shelvedBooks'
+
+# Goodreads asks that we make no more than one request per second.
+GOODREADS_REQUEST_INTERVAL = 1  # seconds
+
+# Each shelf missing from the cache takes ~5s to read from Goodreads.
+# Cap how many shelves a request may name, to finish within the function's timeout.
+MAX_SHELVES_PER_REQUEST = 4
+
+# DynamoDB caps how many keys a single batch read may contain.
+BATCH_GET_LIMIT = 100
+
+# DynamoDB may decline to process some keys in a batch (e.g. when throttled).
+# Retry those with capped exponential backoff, but only a few times.
+BATCH_GET_MAX_ATTEMPTS = 4
+BATCH_GET_BASE_DELAY = 0.05  # seconds
+BATCH_GET_MAX_DELAY = 1.0  # seconds
+
+_CLIENT_CONFIG = Config(
+    # The cache is only an optimization; fail fast instead of hanging on it.
+    connect_timeout=1,
+    read_timeout=3,
+    retries={'max_attempts': 2, 'mode': 'standard'},
+    # TODO (Python 3.7): Pass `tcp_keepalive=True` (requires botocore 1.28+)
+)
+
+
+def _dynamodb_client() -> Any:
+    """ Return a DynamoDB client, going through DAX if a cluster is configured. """
+    dax_endpoint = os.environ.get('DAX_ENDPOINT')
+    if dax_endpoint:
+        # The client is an optional extra, only packaged where the function runs
+        # in the DAX cluster's VPC. Without it, we can still use DynamoDB directly.
+        try:
+            # pylint: disable=import-error,import-outside-toplevel
+            from amazondax import AmazonDaxClient
+        except ImportError:
+            logger.warning("DAX_ENDPOINT is set, but amazondax is not installed!")
+        else:
+            # DAX is a write-through cache: writes must go through it too, or reads go stale.
+            return AmazonDaxClient(endpoint_url=dax_endpoint, config=_CLIENT_CONFIG)
+
+    return boto3.client('dynamodb', config=_CLIENT_CONFIG)
+
+
+# Lambda reuses the execution context between invocations of a warm container.
+# Creating the client once means later invocations reuse its connection pool.
+#
+# We use the low-level client rather than `boto3.resource('dynamodb')`:
+# the resource is slower to initialize, and runs every value through
+# `TypeSerializer`/`TypeDeserializer`. Our items are simple to describe by hand.
+#
+# For local testing, pass: region_name='localhost', endpoint_url='http://localhost:8000'
+# TODO (Set up integration tests)
+_DYNAMODB = _dynamodb_client()
+
+
+def _to_attribute(value: Optional[str]) -> JsonDict:
+    """ Describe a (possibly null) string as a DynamoDB attribute value. """
+    return {'NULL': True} if value is None else {'S': value}
+
+
+def _from_attribute(attribute: JsonDict) -> Optional[str]:
+    """ Read a (possibly null) string from a DynamoDB attribute value. """
+    return None if attribute.get('NULL') else attribute['S']
+
+
+def _book_to_attribute(book: Book) -> JsonDict:
+    """ Describe a book as a DynamoDB map of its (string) fields. """
+    # (Zipping with the fields avoids building an `OrderedDict` via `_asdict()`)
+    return {
+        'M': {field: _to_attribute(value) for field, value in zip(Book._fields, book)}
+    }
+
+
+# Read a book's attributes in field order, so books can be built positionally
+_cached_book_values = operator.itemgetter(*Book._fields)
+
+
+def _book_from_attribute(attribute: JsonDict) -> Book:
+    """ Rebuild a book from its DynamoDB map. """
+    # Note that this relies on Book having primitive types...
+    # (If Book had other NamedTuples for instance, this would not work)
+    return Book._make(map(_from_attribute, _cached_book_values(attribute['M'])))
+
+
+def _cache_key(user_id: str, shelf: str) -> str:
+    """ Identify a user's shelf when reading/writing from the cache. """
+    return f'{user_id}-{shelf}'
+
+
+def _shelf_key(user_id: str, shelf: str) -> JsonDict:
+    """ Return the primary key under which we cache the shelf's books. """
+    return {'userAndShelf': {'S': _cache_key(user_id, shelf)}}
+
+
+def _cache_item(user_id: str, shelf: str, books: List[Book], now_ts: int) -> JsonDict:
+    """ Return a DynamoDB item for caching the books on a user's shelf. """
+    return {
+        **_shelf_key(user_id, shelf),
+        'userId': {'S': user_id},
+        'shelf': {'S': shelf},
+        'retrievedTimestamp': {'N': str(now_ts)},
+        'ttl': {'N': str(now_ts + GOODREADS_CACHE_DURATION)},
+        'books': {'L': [_book_to_attribute(bk) for bk in books]},
+    }
+
 
 # Make a generic type for use in annotating classmethod factory for mypy
 T = TypeVar('T', bound='ShelfResult')  # pylint: disable=invalid-name
@@ -50,14 +189,60 @@ class ShelfResult(typing.NamedTuple):
     # to just have this method return ShelfResult
     @classmethod
     def from_cached_item(cls: Type[T], item: JsonDict) -> T:
-        """ Build a result from a cached value in DynamoDB. """
+        """ Build a result from a cached (low-level, typed) item in DynamoDB. """
         return cls(
-            # Note that this constructor relies on Book having primitive types...
-            # (If Book had other NamedTuples for instance, this would not work)
-            books=[Book(**bk_dict) for bk_dict in item['books']],
-            # Coerce this timestamp to an int, since it comes back as a Decimal
-            retrieved_timestamp=int(item['retrievedTimestamp']),
+            books=[_book_from_attribute(bk) for bk in item['books']['L']],
+            # Numbers are always transmitted as strings
+            retrieved_timestamp=int(item['retrievedTimestamp']['N']),
+        )
+
+
+# Maps each cache key to the time we read it from DynamoDB, and what we read.
+# (Ordered from least to most recently used)
+_IN_PROCESS_CACHE: 'OrderedDict[str, Tuple[int, ShelfResult]]' = OrderedDict()
+
+
+def _recall(key: str, now_ts: int) -> Optional[ShelfResult]:
+    """ Return the result remembered for the key, if it's recent enough. """
+    if key not in _IN_PROCESS_CACHE:
+        return None
+    read_ts, result = _IN_PROCESS_CACHE[key]
+    # Never serve books from memory that DynamoDB would have already expired.
+    retrieved_ts = result.retrieved_timestamp or read_ts
+    if (
+        now_ts - read_ts >= IN_PROCESS_CACHE_DURATION
+        or now_ts - retrieved_ts >= GOODREADS_CACHE_DURATION
+    ):
+        del _IN_PROCESS_CACHE[key]
+        return None
+    _IN_PROCESS_CACHE.move_to_end(key)
+    return result
+
+
+def _remember(key: str, now_ts: int, result: ShelfResult) -> None:
+    """ Remember a cache hit, forgetting the least recently used shelf if full. """
+    _IN_PROCESS_CACHE[key] = (now_ts, result)
+    _IN_PROCESS_CACHE.move_to_end(key)
+    while len(_IN_PROCESS_CACHE) > IN_PROCESS_CACHE_SIZE:
+        _IN_PROCESS_CACHE.popitem(last=False)
+
+
+def _put_cached(user_id: str, shelf: str, books: List[Book], now_ts: int) -> None:
+    """ Cache the shelf's books, unless a concurrent invocation cached a fresher copy. """
+    try:
+        _DYNAMODB.put_item(
+            TableName=SHELF_TABLE_NAME,
+            Item=_cache_item(user_id, shelf, books, now_ts),
+            ConditionExpression=(
+                'attribute_not_exists(retrievedTimestamp) OR retrievedTimestamp < :now'
+            ),
+            ExpressionAttributeValues={':now': {'N': str(now_ts)}},
         )
+    except ClientError as err:
+        if err.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            logger.exception("Failed to cache books for %s", _cache_key(user_id, shelf))
+    except BotoCoreError:  # (e.g. timeouts) The caller still has the books!
+        logger.exception("Failed to cache books for %s", _cache_key(user_id, shelf))
 
 
 def get_wanted_books(user_id: str, shelf: str, skip_cache: bool = False) -> ShelfResult:
@@ -73,54 +258,136 @@ def get_wanted_books(user_id: str, shelf: str, skip_cache: bool = False) -> Shel
     assert user_id
     now_ts = int(time.time())
 
-    # When reading/writing from the cache, this is the key we'll use.
-    key = f'{user_id}-{shelf}'
-    pk_dict = {'userAndShelf': key}
-
-    # For local testing, pass: region_name='localhost', endpoint_url='http://localhost:8000'
-    # TODO (Set up integration tests)
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table('shelvedBooks')
+    key = _cache_key(user_id, shelf)
 
     # Try reading information from the cache first.
     if not skip_cache:
-        cache = table.get_item(Key=pk_dict)
+        remembered = _recall(key, now_ts)
+        if remembered is not None:
+            return remembered
+
+        try:
+            cache = _DYNAMODB.get_item(
+                TableName=SHELF_TABLE_NAME, Key=_shelf_key(user_id, shelf)
+            )
+        except (BotoCoreError, ClientError):  # Treat as a miss
+            logger.exception("Failed to read %s from the cache", key)
+            cache = {}
         if 'Item' in cache:  # Hit!
-            return ShelfResult.from_cached_item(cache['Item'])
+            result = ShelfResult.from_cached_item(cache['Item'])
+            _remember(key, now_ts, result)
+            return result
 
     # If the cache missed, then fetch the shelf now (should take ~5s)
     # (Raises ValueError on key missing)
     reader = goodreads.ShelfReader(user_id, os.environ['GOODREADS_DEV_KEY'])
     wanted_books = list(reader.wanted_books(shelf))
 
-    table.get_item(Key={'userAndShelf': key})
+    # Whatever we remembered is now outdated (DynamoDB will say what's freshest).
+    _IN_PROCESS_CACHE.pop(key, None)
 
     # Write to the cache now so reads are faster next time.
-    table.put_item(
-        Item={
-            **pk_dict,
-            'userId': user_id,
-            'shelf': shelf,
-            'retrievedTimestamp': now_ts,
-            'ttl': now_ts + GOODREADS_CACHE_DURATION,
-            # TODO (Python 3.7): `NamedTuple._as_dict()` doesn't work in a nested fashion.
-            # If we used dataclasses instead, we could use the `as_dict()` method, which *does*
-            'books': [bk._asdict() for bk in wanted_books],
-        }
-    )
+    _put_cached(user_id, shelf, wanted_books, now_ts)
 
     return ShelfResult(books=wanted_books, retrieved_timestamp=None)
 
 
-def error(message: str) -> JsonDict:
-    """ Return a simple error message in a Lambda-compatible dict. """
+def _batch_get_cached(keys: List[JsonDict]) -> Iterator[JsonDict]:
+    """Yield every cached item found for the given keys.
+
+    Keys which DynamoDB still hasn't processed after our final attempt are
+    skipped; the cache is only an optimization, so callers treat them as misses.
+    """
+    for i in range(0, len(keys), BATCH_GET_LIMIT):
+        request: JsonDict = {SHELF_TABLE_NAME: {'Keys': keys[i : i + BATCH_GET_LIMIT]}}
+        for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(min(BATCH_GET_MAX_DELAY, BATCH_GET_BASE_DELAY * 2 ** attempt))
+            response = _DYNAMODB.batch_get_item(RequestItems=request)
+            yield from response['Responses'].get(SHELF_TABLE_NAME, [])
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+
+
+def get_wanted_books_bulk(
+    user_id: str, shelves: List[str], skip_cache: bool = False
+) -> Dict[str, ShelfResult]:
+    """Get books on each of the user's shelves, using cache if available.
+
+    This behaves like `get_wanted_books`, but reads from the cache for all
+    shelves in batches instead of making a round trip per shelf.
+
+    Fetched shelves are still cached one at a time: batched writes can't be
+    conditional, and would clobber fresher results from concurrent invocations.
+    (Each of those writes follows a ~5s Goodreads fetch anyway)
+    """
+    assert user_id
+    now_ts = int(time.time())
+
+    # DynamoDB rejects batches which name the same key twice (keep the given order)
+    shelves = list(dict.fromkeys(shelves))
+
+    results: Dict[str, ShelfResult] = {}
+    if not skip_cache:
+        for shelf in shelves:
+            remembered = _recall(_cache_key(user_id, shelf), now_ts)
+            if remembered is not None:
+                results[shelf] = remembered
+
+        keys = [_shelf_key(user_id, shelf) for shelf in shelves if shelf not in results]
+        try:
+            for item in _batch_get_cached(keys):
+                result = ShelfResult.from_cached_item(item)
+                results[item['shelf']['S']] = result
+                _remember(item['userAndShelf']['S'], now_ts, result)
+        except (BotoCoreError, ClientError):  # Treat any shelves not yet read as misses
+            logger.exception("Failed to read shelves from the cache")
+
+    missed = [shelf for shelf in shelves if shelf not in results]
+    if missed:
+        # (Raises ValueError on key missing)
+        reader = goodreads.ShelfReader(user_id, os.environ['GOODREADS_DEV_KEY'])
+        last_request: Optional[float] = None
+        for shelf in missed:
+            if last_request is not None:
+                wait = last_request + GOODREADS_REQUEST_INTERVAL - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            last_request = time.monotonic()
+            wanted_books = list(reader.wanted_books(shelf))
+            _IN_PROCESS_CACHE.pop(_cache_key(user_id, shelf), None)
+            _put_cached(user_id, shelf, wanted_books, now_ts)
+            results[shelf] = ShelfResult(books=wanted_books, retrieved_timestamp=None)
+
+    return {shelf: results[shelf] for shelf in shelves}
+
+
+def _report(result: ShelfResult) -> JsonDict:
+    """ Describe the result of reading a shelf, for reporting to the caller. """
     return {
-        'statusCode': 400,
-        'headers': {'Content-Type': 'application/json'},
-        'body': message,
+        'isReadFromCache': result.is_cached,
+        'cachedTimestamp': result.retrieved_timestamp,
+        'books': [
+            {
+                'goodreads_id': book.goodreads_id,
+                'isbn': book.isbn,
+                'title': book.title,
+                'author': book.author,
+                # We also read the description + an image URL from Goodreads
+                # However, we avoid reporting that information since the description
+                # may come from Goodreads themselves, and we never hotlink images.
+            }
+            for book in result.books
+        ],
     }
 
 
+def error(message: str) -> JsonDict:
+    """ Return a simple error message in a Lambda-compatible dict. """
+    return {'statusCode': 400, 'headers': dict(_ERROR_HEADERS), 'body': message}
+
+
 def handler(
     event: JsonDict, context: LambdaContext  # pylint: disable=unused-argument
 ) -> JsonDict:
@@ -129,7 +396,7 @@ def handler(
     if json_body is None:
         return error("No data given!")
 
-    body: JsonDict = json.loads(json_body)
+    body: JsonDict = orjson.loads(json_body)
     if not body:
         return error("No body given!")
 
@@ -142,44 +409,30 @@ def handler(
 
     skip_cache: bool = body.get('skipCache', False)
 
+    # Callers may instead name several shelves, to be read all at once.
+    shelves: Optional[List[str]] = body.get('shelves')
+    if shelves is not None and not (
+        shelves
+        and isinstance(shelves, list)
+        and all(name and isinstance(name, str) for name in shelves)
+    ):
+        return error("Specify shelves in a list!")
+    if shelves is not None and len(shelves) > MAX_SHELVES_PER_REQUEST:
+        return error(f"Specify at most {MAX_SHELVES_PER_REQUEST} shelves!")
+
     try:
-        result = get_wanted_books(user_id, shelf, skip_cache=skip_cache)
+        if shelves is not None:
+            results = get_wanted_books_bulk(user_id, shelves, skip_cache=skip_cache)
+            report: JsonDict = {
+                'shelves': {name: _report(result) for name, result in results.items()}
+            }
+        else:
+            report = _report(get_wanted_books(user_id, shelf, skip_cache=skip_cache))
     except ValueError:
         return error("Something went wrong.")  # Most likely bad dev key in env
 
     return {
         'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            # In order to call `api.dcain.me/<RouteName>` from origins other than
-            # `api.dcain.me`, we must enable CORS.
-            #
-            # To enable CORS fully, the first step is to "Enable CORS" from within the
-            # API Gateway console (or, preferably, by using `cors:true` in
-            # `serverless.yml` for each function). This will automatically configure the
-            # `OPTIONS` route with the appropriate CORS headers.
-            #
-            # The next step is to manually return CORS headers from the POST route.
-            # (which is what the below headers do)
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True,
-        },
-        'body': json.dumps(
-            {
-                'isReadFromCache': result.is_cached,
-                'cachedTimestamp': result.retrieved_timestamp,
-                'books': [
-                    {
-                        'goodreads_id': book.goodreads_id,
-                        'isbn': book.isbn,
-                        'title': book.title,
-                        'author': book.author,
-                        # We also read the description + an image URL from Goodreads
-                        # However, we avoid reporting that information since the description
-                        # may come from Goodreads themselves, and we never hotlink images.
-                    }
-                    for book in result.books
-                ],
-            }
-        ),
+        'headers': dict(_SUCCESS_HEADERS),
+        'body': orjson.dumps(report).decode(),
     }
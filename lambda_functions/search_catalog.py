@@ -3,9 +3,9 @@
 """
 Use AWS Lambda to search for books in a library catalog.
 """
-import json
 from typing import Any, Dict, Iterator, List, Optional
 
+import orjson
 from aws_lambda_context import LambdaContext
 
 from bibliophile.bibliocommons import parse
@@ -13,14 +13,38 @@ from bibliophile.bibliocommons.types import Book, BookDescription
 
 JsonDict = Dict[str, Any]
 
+# Response headers (each response is given its own copy of these)
+_ERROR_HEADERS: JsonDict = {'Content-Type': 'application/json'}
+_SUCCESS_HEADERS: JsonDict = {
+    'Content-Type': 'application/json',
+    # In order to call `api.dcain.me/<RouteName>` from origins other than
+    # `api.dcain.me`, we must enable CORS.
+    #
+    # To enable CORS fully, the first step is to "Enable CORS" from within the
+    # API Gateway console (or, preferably, by using `cors:true` in
+    # `serverless.yml` for each function). This will automatically configure the
+    # `OPTIONS` route with the appropriate CORS headers.
+    #
+    # The next step is to manually return CORS headers from the POST route.
+    # (which is what the below headers do)
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': True,
+}
+
+# Each book must be given with exactly these fields
+_DESCRIPTION_FIELDS = frozenset(BookDescription._fields)
+
+
+def _book_as_dict(obj: Any) -> JsonDict:
+    """ Serialize found books, which orjson doesn't handle natively. """
+    if isinstance(obj, Book):
+        return obj._asdict()
+    raise TypeError
+
 
 def error(message: str) -> JsonDict:
     """ Return a simple error message in a Lambda-compatible dict. """
-    return {
-        'statusCode': 400,
-        'headers': {'Content-Type': 'application/json'},
-        'body': message,
-    }
+    return {'statusCode': 400, 'headers': dict(_ERROR_HEADERS), 'body': message}
 
 
 def handler(
@@ -46,7 +70,7 @@ def handler(
     if json_body is None:
         return error("No data given!")
 
-    body: JsonDict = json.loads(json_body)
+    body: JsonDict = orjson.loads(json_body)
     if not body:
         return error("No body given!")
 
@@ -67,12 +91,12 @@ def handler(
     ):
         return error("Specify books in a structured list!")
 
-    try:
-        descriptions: List[BookDescription] = [
-            BookDescription(**book_dict) for book_dict in dict_books
-        ]
-    except (KeyError, TypeError):
+    # Check every book's fields before building any descriptions.
+    if any(book_dict.keys() != _DESCRIPTION_FIELDS for book_dict in dict_books):
         return error(f"Books must include fields {BookDescription._fields}")
+    descriptions: List[BookDescription] = [
+        BookDescription(**book_dict) for book_dict in dict_books
+    ]
 
     biblio_parser = parse.BiblioParser(
         biblio_subdomain=biblio_subdomain,
@@ -83,20 +107,7 @@ def handler(
 
     return {
         'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            # In order to call `api.dcain.me/<RouteName>` from origins other than
-            # `api.dcain.me`, we must enable CORS.
-            #
-            # To enable CORS fully, the first step is to "Enable CORS" from within the
-            # API Gateway console (or, preferably, by using `cors:true` in
-            # `serverless.yml` for each function). This will automatically configure the
-            # `OPTIONS` route with the appropriate CORS headers.
-            #
-            # The next step is to manually return CORS headers from the POST route.
-            # (which is what the below headers do)
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True,
-        },
-        'body': json.dumps({'books': [book._asdict() for book in books]}),
+        'headers': dict(_SUCCESS_HEADERS),
+        # Let orjson convert each book as it goes, rather than building a list of dicts.
+        'body': orjson.dumps({'books': list(books)}, default=_book_as_dict).decode(),
     }
@@ -13,11 +13,13 @@ from unittest import mock
 import boto3
 import yaml
 from aws_lambda_context import LambdaContext
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
 from moto import mock_dynamodb2
 
 from bibliophile import goodreads
 from bibliophile.goodreads.types import Book
 
+from .. import read_shelf
 from ..read_shelf import handler
 
 dummy_context = LambdaContext()
@@ -25,6 +27,11 @@ dummy_context = LambdaContext()
 JsonDict = Dict[str, Any]
 
 
+def with_parsed_body(response: JsonDict) -> JsonDict:
+    """ Parse the JSON body, so we compare data rather than the encoder's output. """
+    return {**response, 'body': json.loads(response['body'])}
+
+
 class HandlerTest(unittest.TestCase):
     """ Test the lambda function handler which reads from Goodreads shelves. """
 
@@ -40,6 +47,14 @@ class HandlerTest(unittest.TestCase):
             },
         )
 
+    def test_headers_not_shared(self):
+        """ Changing one response's headers doesn't affect later responses. """
+        first = handler({'body': None}, context=dummy_context)
+        first['headers']['Content-Type'] = 'text/plain'
+
+        second = handler({'body': None}, context=dummy_context)
+        self.assertEqual(second['headers'], {'Content-Type': 'application/json'})
+
     def test_no_body(self):
         """ If the endpoint gets an empty payload, we handle that. """
         response = handler({'body': '{}'}, context=dummy_context)
@@ -68,9 +83,48 @@ class HandlerTest(unittest.TestCase):
             )
 
 
-@mock_dynamodb2
-class CachingTest(unittest.TestCase):
-    """ Test the lambda function's caching behavior. """
+class ClientTest(unittest.TestCase):
+    """ Test how we pick a client for the shelf cache. """
+
+    # pylint: disable=protected-access
+
+    def test_dynamodb_by_default(self):
+        """ Without a DAX cluster, we talk to DynamoDB directly. """
+        with mock.patch.dict('os.environ', clear=True):
+            with mock.patch.object(read_shelf.boto3, 'client') as client:
+                dynamodb = read_shelf._dynamodb_client()
+
+        self.assertIs(dynamodb, client.return_value)
+        client.assert_called_once_with('dynamodb', config=read_shelf._CLIENT_CONFIG)
+
+    def test_dax_endpoint(self):
+        """ If a DAX cluster is configured, all cache traffic goes through it. """
+        amazondax = mock.Mock()
+        with mock.patch.dict('sys.modules', {'amazondax': amazondax}):
+            with mock.patch.dict('os.environ', {'DAX_ENDPOINT': 'dax.example:8111'}):
+                dax_client = read_shelf._dynamodb_client()
+
+        self.assertIs(dax_client, amazondax.AmazonDaxClient.return_value)
+        # DAX is held to the same timeouts & retries as DynamoDB.
+        amazondax.AmazonDaxClient.assert_called_once_with(
+            endpoint_url='dax.example:8111', config=read_shelf._CLIENT_CONFIG
+        )
+
+    def test_dax_client_not_installed(self):
+        """ Without the optional DAX client, we fall back to DynamoDB. """
+        # (A `None` entry makes any import of the module raise ImportError)
+        with mock.patch.dict('sys.modules', {'amazondax': None}):
+            with mock.patch.dict('os.environ', {'DAX_ENDPOINT': 'dax.example:8111'}):
+                with mock.patch.object(read_shelf.boto3, 'client') as client:
+                    with self.assertLogs(read_shelf.logger, level='WARNING'):
+                        dynamodb = read_shelf._dynamodb_client()
+
+        self.assertIs(dynamodb, client.return_value)
+        client.assert_called_once_with('dynamodb', config=read_shelf._CLIENT_CONFIG)
+
+
+class CachingTestCase(unittest.TestCase):
+    """ Set up a DynamoDB table for tests which exercise the shelf cache. """
 
     expected_books: List[Book] = [
         Book(
@@ -93,7 +147,7 @@ class CachingTest(unittest.TestCase):
 
     @staticmethod
     def success_response(is_cached: bool, cached_ts: Optional[int] = None) -> JsonDict:
-        """ Return what we'd expect as a response dictionary from a successful call. """
+        """ Return what we'd expect from a successful call (with the body parsed). """
         body: JsonDict = {
             'isReadFromCache': is_cached,
             'cachedTimestamp': cached_ts,
@@ -119,12 +173,36 @@ class CachingTest(unittest.TestCase):
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Credentials': True,
             },
-            'body': json.dumps(body),
+            'body': body,
         }
 
+    @classmethod
+    def setUpClass(cls):
+        # Create the table just once; tests only need it emptied in between.
+        # (Decorating the class with `mock_dynamodb2` would reset moto before each test)
+        cls.mock_dynamodb = mock_dynamodb2()
+        cls.mock_dynamodb.start()
+        cls.table = cls.create_table(boto3.resource('dynamodb'))
+
+        # The handler's client is created at import time, outside of moto's mock.
+        cls.client = boto3.client('dynamodb')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.table.delete()
+        cls.mock_dynamodb.stop()
+
     def setUp(self):
-        dynamodb = boto3.resource('dynamodb')
-        self.table = self.create_table(dynamodb)
+        patch_client = mock.patch.object(read_shelf, '_DYNAMODB', self.client)
+        patch_client.start()
+        self.addCleanup(patch_client.stop)
+
+        # Don't let results remembered by one test leak into the next.
+        patch_memory = mock.patch.dict(
+            read_shelf._IN_PROCESS_CACHE, clear=True  # pylint: disable=protected-access
+        )
+        patch_memory.start()
+        self.addCleanup(patch_memory.stop)
 
         self.fake_reader = mock.Mock(spec=goodreads.ShelfReader)
         self.fake_reader.wanted_books.return_value = self.expected_books
@@ -163,7 +241,14 @@ class CachingTest(unittest.TestCase):
         return table
 
     def tearDown(self):
-        self.table.delete()
+        scan = self.table.scan(ProjectionExpression='userAndShelf')
+        with self.table.batch_writer() as batch:
+            for key in scan['Items']:
+                batch.delete_item(Key=key)
+
+
+class CachingTest(CachingTestCase):
+    """ Test the lambda function's caching behavior. """
 
     def test_missing_dev_key(self):
         """ We say something went wrong if dev key is missing. """
@@ -201,7 +286,34 @@ class CachingTest(unittest.TestCase):
         ShelfReader.assert_called_once_with('12345', 'fake-key')
         self.fake_reader.wanted_books.assert_called_once_with('custom-to-read')
 
-        self.assertEqual(response, self.success_response(is_cached=False))
+        self.assertEqual(
+            with_parsed_body(response), self.success_response(is_cached=False)
+        )
+
+    def test_cache_miss_reads_cache_once(self):
+        """ A cache miss costs just one read from DynamoDB (then a write). """
+        okay_payload = {'userId': '12345', 'shelf': 'custom-to-read'}
+
+        client = read_shelf._DYNAMODB  # pylint: disable=protected-access
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(
+                    client, 'get_item', wraps=client.get_item
+                ) as get_item:
+                    with mock.patch.object(
+                        client, 'put_item', wraps=client.put_item
+                    ) as put_item:
+                        response = handler(
+                            {'body': json.dumps(okay_payload)}, context=dummy_context
+                        )
+
+        self.assertEqual(
+            with_parsed_body(response), self.success_response(is_cached=False)
+        )
+        get_item.assert_called_once()
+        put_item.assert_called_once()
 
     def test_cache_miss_then_hit(self):
         """ When there's a cache miss, we query the shelf & store results. """
@@ -223,7 +335,9 @@ class CachingTest(unittest.TestCase):
         # The first call was a cache miss - we hit the API endpoint
         ShelfReader.assert_called_once_with('12345', 'fake-key')
         self.fake_reader.wanted_books.assert_called_once_with('custom-to-read')
-        self.assertEqual(response, self.success_response(is_cached=False))
+        self.assertEqual(
+            with_parsed_body(response), self.success_response(is_cached=False)
+        )
 
         self.fake_reader.reset_mock()
 
@@ -235,13 +349,53 @@ class CachingTest(unittest.TestCase):
             )
 
         self.assertEqual(
-            response2, self.success_response(is_cached=True, cached_ts=1606088676)
+            with_parsed_body(response2),
+            self.success_response(is_cached=True, cached_ts=1606088676),
         )
 
         # We don't need to initialize a reader, nor request books
         ShelfReader.assert_not_called()
         self.fake_reader.wanted_books.assert_not_called()
 
+    def test_repeat_hits_served_from_memory(self):
+        """ A warm container briefly remembers cache hits, skipping DynamoDB. """
+        okay_payload = {'userId': '12345', 'shelf': 'custom-to-read'}
+        client = read_shelf._DYNAMODB  # pylint: disable=protected-access
+
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(time, 'time') as get_time:
+                    get_time.return_value = 1606088676.82907
+                    handler({'body': json.dumps(okay_payload)}, context=dummy_context)
+
+                    with mock.patch.object(
+                        client, 'get_item', wraps=client.get_item
+                    ) as get_item:
+                        # The first hit comes from DynamoDB, the next from memory.
+                        get_time.return_value = 1606088680
+                        first = handler(
+                            {'body': json.dumps(okay_payload)}, context=dummy_context
+                        )
+                        get_time.return_value = 1606088700
+                        second = handler(
+                            {'body': json.dumps(okay_payload)}, context=dummy_context
+                        )
+                        get_item.assert_called_once()
+
+                        # After a minute, we check DynamoDB again.
+                        get_time.return_value = 1606088740
+                        handler(
+                            {'body': json.dumps(okay_payload)}, context=dummy_context
+                        )
+                        self.assertEqual(get_item.call_count, 2)
+
+        expected = self.success_response(is_cached=True, cached_ts=1606088676)
+        self.assertEqual(with_parsed_body(first), expected)
+        self.assertEqual(with_parsed_body(second), expected)
+        self.fake_reader.wanted_books.assert_called_once_with('custom-to-read')
+
     def test_cache_bypass(self):
         """ Users can request to ignore the cache entirely. """
         bypass_payload = {
@@ -263,7 +417,9 @@ class CachingTest(unittest.TestCase):
         # We hit the API endpoint to get results
         ShelfReader.assert_called_once_with('12345', 'fake-key')
         self.fake_reader.wanted_books.assert_called_once_with('custom-to-read')
-        self.assertEqual(response, self.success_response(is_cached=False))
+        self.assertEqual(
+            with_parsed_body(response), self.success_response(is_cached=False)
+        )
 
         # We recorded a result directly to the cache
         cached = self.table.get_item(Key={'userAndShelf': '12345-custom-to-read'})
@@ -282,7 +438,379 @@ class CachingTest(unittest.TestCase):
                 response2 = handler(
                     {'body': json.dumps(bypass_payload)}, context=dummy_context
                 )
-            self.assertEqual(response2, self.success_response(is_cached=False))
+            self.assertEqual(
+                with_parsed_body(response2), self.success_response(is_cached=False)
+            )
 
         # We made a fresh call to get results
         self.fake_reader.wanted_books.assert_called_once_with('custom-to-read')
+
+    def test_fresher_cache_not_overwritten(self):
+        """ A slow fetch won't replace results cached by a later invocation. """
+        bypass_payload = {
+            'userId': '12345',
+            'shelf': 'custom-to-read',
+            'skipCache': True,
+        }
+        stale_books = self.expected_books[:1]
+
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(time, 'time') as get_time:
+                    # The later invocation finishes first, and caches its results.
+                    get_time.return_value = 1606088676.82907
+                    handler({'body': json.dumps(bypass_payload)}, context=dummy_context)
+
+                    # An invocation that started earlier then tries to write.
+                    self.fake_reader.wanted_books.return_value = stale_books
+                    get_time.return_value = 1606088670.0
+                    response = handler(
+                        {'body': json.dumps(bypass_payload)}, context=dummy_context
+                    )
+
+        # The caller still gets the books which were just fetched.
+        self.assertEqual(
+            [bk['title'] for bk in json.loads(response['body'])['books']],
+            ["Cat's Cradle"],
+        )
+
+        # However, the fresher results remain in the cache.
+        cached = self.table.get_item(Key={'userAndShelf': '12345-custom-to-read'})
+        self.assertEqual(cached['Item']['retrievedTimestamp'], 1606088676)
+        self.assertCountEqual(
+            [bk['title'] for bk in cached['Item']['books']],
+            {"Cat's Cradle", "Don Quixote"},
+        )
+
+    def test_cache_unavailable(self):
+        """ If DynamoDB is unreachable, we still read & report the shelf. """
+        okay_payload = {'userId': '12345', 'shelf': 'to-read'}
+        client = read_shelf._DYNAMODB  # pylint: disable=protected-access
+
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(
+                    client, 'get_item', side_effect=ConnectTimeoutError(endpoint_url='')
+                ), mock.patch.object(
+                    client, 'put_item', side_effect=ReadTimeoutError(endpoint_url='')
+                ):
+                    with self.assertLogs(read_shelf.logger, level='ERROR') as logs:
+                        response = handler(
+                            {'body': json.dumps(okay_payload)}, context=dummy_context
+                        )
+
+        self.assertEqual(len(logs.records), 2)  # Both the read & the write failed.
+        self.assertEqual(
+            with_parsed_body(response), self.success_response(is_cached=False)
+        )
+        self.fake_reader.wanted_books.assert_called_once_with('to-read')
+
+    def test_in_process_cache_is_bounded(self):
+        """ Only the most recently used shelves are remembered in memory. """
+        # pylint: disable=protected-access
+        results = {
+            key: read_shelf.ShelfResult(books=[], retrieved_timestamp=1606088676)
+            for key in ['a', 'b', 'c']
+        }
+        with mock.patch.object(read_shelf, 'IN_PROCESS_CACHE_SIZE', 2):
+            read_shelf._remember('a', 1606088680, results['a'])
+            read_shelf._remember('b', 1606088680, results['b'])
+            self.assertIs(read_shelf._recall('a', 1606088690), results['a'])
+
+            # 'b' is now the least recently used, so it makes way for 'c'
+            read_shelf._remember('c', 1606088690, results['c'])
+
+        self.assertEqual(list(read_shelf._IN_PROCESS_CACHE), ['a', 'c'])
+        self.assertIsNone(read_shelf._recall('b', 1606088690))
+
+        # Entries are forgotten once they're too old to be served.
+        self.assertIsNone(read_shelf._recall('a', 1606088740))
+        self.assertEqual(list(read_shelf._IN_PROCESS_CACHE), ['c'])
+
+    def test_in_process_cache_respects_goodreads_terms(self):
+        """ We never remember shelves for longer than Goodreads permits. """
+        # pylint: disable=protected-access
+        day = read_shelf.GOODREADS_CACHE_DURATION
+        almost_expired = read_shelf.ShelfResult(
+            books=[], retrieved_timestamp=1606088676 - day + 10
+        )
+        read_shelf._remember('a', 1606088676, almost_expired)
+
+        # Just read from DynamoDB, but the cached books are now too old.
+        self.assertIs(read_shelf._recall('a', 1606088680), almost_expired)
+        self.assertIsNone(read_shelf._recall('a', 1606088686))
+        self.assertNotIn('a', read_shelf._IN_PROCESS_CACHE)
+
+
+class BulkCachingTest(CachingTestCase):
+    """ Test reading several shelves (from the cache) at once. """
+
+    def setUp(self):
+        super().setUp()
+
+        # Don't actually wait between (fake) Goodreads requests.
+        patch_sleep = mock.patch.object(time, 'sleep')
+        self.sleep = patch_sleep.start()
+        self.addCleanup(patch_sleep.stop)
+
+    def test_bulk_read(self):
+        """ Shelves are read from the cache in bulk, and only misses are fetched. """
+        # Cache just one of the two shelves.
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(time, 'time') as get_time:
+                    get_time.return_value = 1606088676.82907
+                    read_shelf.get_wanted_books('12345', 'to-read')
+        self.fake_reader.reset_mock()
+
+        client = read_shelf._DYNAMODB  # pylint: disable=protected-access
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(
+                    client, 'put_item', wraps=client.put_item
+                ) as put_item:
+                    results = read_shelf.get_wanted_books_bulk(
+                        '12345', ['to-read', 'favorites']
+                    )
+
+        self.assertEqual(set(results), {'to-read', 'favorites'})
+        self.assertEqual(results['to-read'].retrieved_timestamp, 1606088676)
+        self.assertFalse(results['favorites'].is_cached)
+        for result in results.values():
+            self.assertEqual(result.books, self.expected_books)
+
+        # Only the missing shelf was fetched, then cached.
+        self.fake_reader.wanted_books.assert_called_once_with('favorites')
+        put_item.assert_called_once()
+        cached = self.table.get_item(Key={'userAndShelf': '12345-favorites'})
+        self.assertCountEqual(
+            [bk['title'] for bk in cached['Item']['books']],
+            {"Cat's Cradle", "Don Quixote"},
+        )
+
+    def test_bulk_read_all_cached(self):
+        """ When every shelf is cached, we needn't fetch from Goodreads at all. """
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                read_shelf.get_wanted_books_bulk('12345', ['to-read', 'favorites'])
+
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                results = read_shelf.get_wanted_books_bulk(
+                    '12345', ['to-read', 'favorites']
+                )
+
+        ShelfReader.assert_not_called()
+        self.assertTrue(all(result.is_cached for result in results.values()))
+
+    def test_bulk_read_duplicate_shelves(self):
+        """ Each shelf is read (and cached) once, even if named more than once. """
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                results = read_shelf.get_wanted_books_bulk(
+                    '12345', ['to-read', 'favorites', 'to-read']
+                )
+
+        self.assertEqual(list(results), ['to-read', 'favorites'])
+        self.assertEqual(
+            self.fake_reader.wanted_books.call_args_list,
+            [mock.call('to-read'), mock.call('favorites')],
+        )
+
+        # Once cached, duplicates are read back without complaint.
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                results = read_shelf.get_wanted_books_bulk(
+                    '12345', ['favorites', 'favorites']
+                )
+        ShelfReader.assert_not_called()
+        self.assertEqual(list(results), ['favorites'])
+        self.assertTrue(results['favorites'].is_cached)
+
+    def test_bulk_fresher_cache_not_overwritten(self):
+        """ Bulk reads won't replace results cached by a later invocation. """
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(time, 'time') as get_time:
+                    # The later invocation finishes first, and caches its results.
+                    get_time.return_value = 1606088676.82907
+                    read_shelf.get_wanted_books('12345', 'favorites', skip_cache=True)
+
+                    # An invocation that started earlier then tries to write.
+                    self.fake_reader.wanted_books.return_value = self.expected_books[:1]
+                    get_time.return_value = 1606088670.0
+                    results = read_shelf.get_wanted_books_bulk(
+                        '12345', ['to-read', 'favorites'], skip_cache=True
+                    )
+
+        self.assertEqual(len(results['favorites'].books), 1)
+
+        # The fresher results remain in the cache, but the other shelf was cached.
+        fresher = self.table.get_item(Key={'userAndShelf': '12345-favorites'})
+        self.assertEqual(fresher['Item']['retrievedTimestamp'], 1606088676)
+        self.assertEqual(len(fresher['Item']['books']), 2)
+        cached = self.table.get_item(Key={'userAndShelf': '12345-to-read'})
+        self.assertEqual(cached['Item']['retrievedTimestamp'], 1606088670)
+
+    def test_handler_reads_shelves(self):
+        """ Callers may read several shelves in one request. """
+        payload = {'userId': '12345', 'shelves': ['to-read', 'favorites']}
+
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                response = handler({'body': json.dumps(payload)}, context=dummy_context)
+
+        expected_shelf = self.success_response(is_cached=False)['body']
+        self.assertEqual(
+            with_parsed_body(response),
+            {
+                **self.success_response(is_cached=False),
+                'body': {
+                    'shelves': {'to-read': expected_shelf, 'favorites': expected_shelf}
+                },
+            },
+        )
+
+    def test_handler_malformed_shelves(self):
+        """ Shelves must be given as a list of names. """
+        for shelves in [[], 'to-read', [None], ['to-read', '']]:
+            payload = {'userId': '12345', 'shelves': shelves}
+            response = handler({'body': json.dumps(payload)}, context=dummy_context)
+            self.assertEqual(
+                response,
+                {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json'},
+                    'body': "Specify shelves in a list!",
+                },
+            )
+
+    def test_bulk_read_backs_off_when_throttled(self):
+        """ Keys DynamoDB won't process are retried a few times, then fetched. """
+        unprocessed = {
+            'Responses': {},
+            'UnprocessedKeys': {
+                'shelvedBooks': {'Keys': [{'userAndShelf': {'S': '12345-to-read'}}]}
+            },
+        }
+        client = read_shelf._DYNAMODB  # pylint: disable=protected-access
+
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(
+                    client, 'batch_get_item', return_value=unprocessed
+                ) as batch_get_item:
+                    results = read_shelf.get_wanted_books_bulk('12345', ['to-read'])
+
+        self.assertEqual(batch_get_item.call_count, 4)
+        self.assertEqual(
+            self.sleep.call_args_list,
+            [mock.call(0.1), mock.call(0.2), mock.call(0.4)],
+        )
+
+        # We gave up on the cache, and read the shelf instead.
+        self.assertFalse(results['to-read'].is_cached)
+        self.fake_reader.wanted_books.assert_called_once_with('to-read')
+
+    def test_bulk_read_served_from_memory(self):
+        """ Bulk reads share the in-process memory of recent cache hits. """
+        client = read_shelf._DYNAMODB  # pylint: disable=protected-access
+
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(time, 'time') as get_time:
+                    get_time.return_value = 1606088676.82907
+                    read_shelf.get_wanted_books_bulk('12345', ['to-read', 'favorites'])
+
+                    # Hits are read from DynamoDB once, then from memory.
+                    with mock.patch.object(
+                        client, 'batch_get_item', wraps=client.batch_get_item
+                    ) as batch_get_item:
+                        get_time.return_value = 1606088680
+                        read_shelf.get_wanted_books_bulk('12345', ['to-read'])
+                        get_time.return_value = 1606088690
+                        results = read_shelf.get_wanted_books_bulk(
+                            '12345', ['to-read', 'favorites']
+                        )
+
+                    # A single-shelf read also finds what the bulk read remembered.
+                    with mock.patch.object(client, 'get_item') as get_item:
+                        single = read_shelf.get_wanted_books('12345', 'to-read')
+
+        # Only the shelf which wasn't yet remembered was read from DynamoDB.
+        self.assertEqual(batch_get_item.call_count, 2)
+        self.assertEqual(
+            batch_get_item.call_args[1]['RequestItems']['shelvedBooks']['Keys'],
+            [{'userAndShelf': {'S': '12345-favorites'}}],
+        )
+        get_item.assert_not_called()
+        self.assertIs(single, results['to-read'])
+        self.assertTrue(all(result.is_cached for result in results.values()))
+
+    def test_goodreads_requests_spaced_out(self):
+        """ We wait between reading shelves, per the Goodreads API terms. """
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(time, 'monotonic') as monotonic:
+                    # The first shelf is requested at 100s, the next ready at 100.25s
+                    monotonic.side_effect = [100.0, 100.25, 101.0]
+                    read_shelf.get_wanted_books_bulk('12345', ['to-read', 'favorites'])
+
+        self.sleep.assert_called_once_with(0.75)
+        self.assertEqual(self.fake_reader.wanted_books.call_count, 2)
+
+    def test_handler_too_many_shelves(self):
+        """ Reading many uncached shelves could exceed the function's timeout. """
+        payload = {'userId': '12345', 'shelves': ['a', 'b', 'c', 'd', 'e']}
+        response = handler({'body': json.dumps(payload)}, context=dummy_context)
+        self.assertEqual(
+            response,
+            {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': "Specify at most 4 shelves!",
+            },
+        )
+
+    def test_bulk_read_cache_unavailable(self):
+        """ If DynamoDB is unreachable, bulk reads treat every shelf as a miss. """
+        client = read_shelf._DYNAMODB  # pylint: disable=protected-access
+
+        with mock.patch.dict('os.environ', {'GOODREADS_DEV_KEY': 'fake-key'}):
+            # pylint: disable=invalid-name
+            with mock.patch.object(goodreads, 'ShelfReader') as ShelfReader:
+                ShelfReader.return_value = self.fake_reader
+                with mock.patch.object(
+                    client,
+                    'batch_get_item',
+                    side_effect=ConnectTimeoutError(endpoint_url=''),
+                ):
+                    with self.assertLogs(read_shelf.logger, level='ERROR'):
+                        results = read_shelf.get_wanted_books_bulk(
+                            '12345', ['to-read', 'favorites']
+                        )
+
+        self.assertFalse(any(result.is_cached for result in results.values()))
+        self.assertEqual(self.fake_reader.wanted_books.call_count, 2)
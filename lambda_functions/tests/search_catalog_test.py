@@ -28,6 +28,14 @@ class HandlerTest(unittest.TestCase):
             },
         )
 
+    def test_headers_not_shared(self):
+        """ Changing one response's headers doesn't affect later responses. """
+        first = handler({'body': None}, context=dummy_context)
+        first['headers']['Content-Type'] = 'text/plain'
+
+        second = handler({'body': None}, context=dummy_context)
+        self.assertEqual(second['headers'], {'Content-Type': 'application/json'})
+
     def test_no_body(self):
         """ If the endpoint gets an empty payload, we handle that. """
         response = handler({'body': '{}'}, context=dummy_context)
@@ -108,6 +116,30 @@ class HandlerTest(unittest.TestCase):
             },
         )
 
+    def test_extra_fields(self):
+        """ Books may not include fields beyond those required. """
+        extra_fields = {
+            'books': [
+                {
+                    'isbn': '0140285601',
+                    'title': "Cat's Cradle",
+                    'author': 'Kurt Vonnegut Jr.',
+                    'rating': 5,
+                }
+            ],
+            'biblio_subdomain': 'seattle',
+            'branch': 'Ballard Branch',
+        }
+        response = handler({'body': json.dumps(extra_fields)}, context=dummy_context)
+        self.assertEqual(
+            response,
+            {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json'},
+                'body': "Books must include fields ('isbn', 'title', 'author')",
+            },
+        )
+
     def test_string_arg_missing(self):
         """ We warn if a required arg is missing. """
         body = {'branch': 'sfpl', 'biblio_subdomain': ''}
@@ -171,6 +203,8 @@ class HandlerTest(unittest.TestCase):
             ]
         )
 
+        # Compare the parsed body, so we're not testing the JSON encoder's formatting.
+        body = json.loads(response.pop('body'))
         self.assertEqual(
             response,
             {
@@ -180,15 +214,20 @@ class HandlerTest(unittest.TestCase):
                     'Access-Control-Allow-Origin': '*',
                     'Access-Control-Allow-Credentials': True,
                 },
-                'body': (
-                    '{"books": [{'
-                    '"title": "Cat\'s Cradle", '
-                    '"author": "Kurt Vonnegut Jr.", '
-                    '"description": "and the silver spoon...", '
-                    '"call_number": "F VONNEGUT", '
-                    '"cover_image": "https://secure.syndetics.com/index.aspx?isbn=9780385333481/MC.GIF&client=sfpl&type=xw12&oclc=", '
-                    '"full_record_link": "https://sfpl.bibliocommons.com/item/show/1268424093"}'
-                    ']}'
-                ),
+            },
+        )
+        self.assertEqual(
+            body,
+            {
+                'books': [
+                    {
+                        'title': "Cat's Cradle",
+                        'author': 'Kurt Vonnegut Jr.',
+                        'description': 'and the silver spoon...',
+                        'call_number': 'F VONNEGUT',
+                        'cover_image': 'https://secure.syndetics.com/index.aspx?isbn=9780385333481/MC.GIF&client=sfpl&type=xw12&oclc=',
+                        'full_record_link': 'https://sfpl.bibliocommons.com/item/show/1268424093',
+                    }
+                ]
             },
         )